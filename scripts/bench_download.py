@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark download write paths against a file served on loopback.
+
+Compares the old `iter_content(8192)` loop, `Downloader` with the
+`readinto` buffer copy and `Downloader` with segmented `Range` requests.
+Best MB/s of several runs is printed for each.
+
+Exp. `python scripts/bench_download.py --size 256 --segments 4`"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC)
+
+# pylint: disable=wrong-import-position
+import requests
+
+from reddit_dl.downloader import Downloader
+from reddit_dl.constants import SEGMENT_MIN_SIZE
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves `server.file_path` for every GET, with single `Range` support."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Send whole file or requested range of it."""
+
+        size = os.path.getsize(self.server.file_path)
+        start, end = 0, size - 1
+        ranged = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+
+        if ranged:
+            start = int(ranged[1])
+            end = min(int(ranged[2]), end) if ranged[2] else end
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+        with open(self.server.file_path, 'rb') as file:
+            file.seek(start)
+            remaining = end - start + 1
+            try:
+                while remaining:
+                    chunk = file.read(min(remaining, 1024 * 1024))
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                # Segmented downloads close first response after headers
+                pass
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+def iter_content_download(url: str, path: str) -> str:
+    """Download with `iter_content(8192)`, as before the readinto copy."""
+
+    full_path = os.path.join(path, 'iter_content.bin')
+    with requests.get(url, stream=True, timeout=60) as res:
+        with open(full_path, 'wb') as file:
+            for chunk in res.iter_content(8192):
+                file.write(chunk)
+    return full_path
+
+def best_speed(func, size: int, runs: int) -> float:
+    """Returns best MB/s of `func()` runs, downloaded files are removed."""
+
+    best = 0.0
+    for _ in range(runs):
+        started = time.perf_counter()
+        path = func()
+        elapsed = time.perf_counter() - started
+        if os.path.getsize(path) != size:
+            sys.exit(f'{path} has wrong size.')
+        os.remove(path)
+        best = max(best, size / elapsed / 1024 ** 2)
+    return best
+
+def main():
+    """Entry point."""
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--size', metavar='MB', type=int, default=256,
+        help='Size of served file in MB. Defaults to 256.')
+    parser.add_argument(
+        '--segments', metavar='N', type=int, default=4,
+        help='Number of parts of segmented download. Defaults to 4.')
+    parser.add_argument(
+        '--runs', metavar='N', type=int, default=3,
+        help='Number of runs, best one is printed. Defaults to 3.')
+    args = parser.parse_args()
+
+    size = args.size * 1024 ** 2
+    if size < SEGMENT_MIN_SIZE:
+        sys.exit(f'Segmented downloads need files of {SEGMENT_MIN_SIZE // 1024 ** 2} MB or more.')
+
+    tmp_dir = tempfile.mkdtemp()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    try:
+        server.file_path = os.path.join(tmp_dir, 'served.bin')
+        with open(server.file_path, 'wb') as file:
+            for _ in range(args.size):
+                file.write(os.urandom(1024 ** 2))
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/media.mp4'
+        out_dir = os.path.join(tmp_dir, 'out')
+        os.mkdir(out_dir)
+
+        single = Downloader(segments=1)
+        segmented = Downloader(segments=args.segments)
+        benchmarks = [
+            ('iter_content(8192)', lambda: iter_content_download(url, out_dir)),
+            ('readinto copy', lambda: single.download(url, out_dir)),
+            (f'{args.segments} segments', lambda: segmented.download(url, out_dir)),
+        ]
+
+        for name, func in benchmarks:
+            print(f'{name:<20} {best_speed(func, size, args.runs):8.1f} MB/s')
+    finally:
+        server.shutdown()
+        shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    main()
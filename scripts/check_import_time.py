@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""Check import time of the cli module with `python -X importtime`.
+
+Fails when importing `reddit_dl.__main__` pulls in heavy modules, which
+must be imported after argument parsing, or when it takes longer than
+the budget. Best of several runs is used, so noise doesn't fail it.
+
+Exp. `python scripts/check_import_time.py --budget 50`"""
+
+import os
+import sys
+import subprocess
+from argparse import ArgumentParser
+
+HEAVY_MODULES = ('requests', 'bs4', 'm3u8')
+MODULE = 'reddit_dl.__main__'
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+
+def import_times() -> dict:
+    """Returns cumulative import time in microseconds of each imported module."""
+
+    # Run in `src`, so `reddit_dl.py` wrapper of repo root doesn't shadow package
+    res = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {MODULE}'],
+        cwd=SRC, capture_output=True, text=True, check=True)
+
+    times = {}
+    for line in res.stderr.splitlines():
+        # `import time:   self [us] | cumulative | imported package`
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def main():
+    """Entry point."""
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--budget', metavar='MS', type=float, default=50.0,
+        help='Maximum import time in milliseconds. Defaults to 50.')
+    parser.add_argument(
+        '--runs', metavar='N', type=int, default=5,
+        help='Number of runs, best one is checked. Defaults to 5.')
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+
+    heavy = sorted({
+        name.split('.')[0] for times in runs for name in times} & set(HEAVY_MODULES))
+    if heavy:
+        sys.exit(f'{MODULE} imports heavy modules: {", ".join(heavy)}')
+
+    best = min(times[MODULE] for times in runs) / 1000
+    if best > args.budget:
+        sys.exit(f'{MODULE} import took {best:.1f} ms, budget is {args.budget:.1f} ms')
+
+    print(f'{MODULE} import took {best:.1f} ms, budget is {args.budget:.1f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -4,15 +4,20 @@
 
 import os
 import sys
-from typing import List
+from typing import TYPE_CHECKING, List
 from argparse import ArgumentParser, ArgumentTypeError, SUPPRESS
 from urllib.parse import urlparse, urlunparse
 
 from . import __version__
-from .reddit_dl import RedditDownloader
+from .constants import WATCH_MIN_INTERVAL, WATCH_MAX_INTERVAL
 from .utils import is_valid_url
 from .exceptions import ExistFileOnUpdateModeException, ConnectionException
 
+# Heavy modules (requests, bs4, m3u8) are imported after argument
+# parsing, so `--help`, `--version` and bad arguments exit fast.
+if TYPE_CHECKING:
+    from .reddit_dl import RedditDownloader
+
 
 def build_url(list_, type_):
     """Build urls from args."""
@@ -56,7 +61,29 @@ def is_valid_target(target):
         return target
     raise ArgumentTypeError(f"target:{target} is not valid.")
 
-def _main(redl: RedditDownloader, targetlist: List[str]) -> None:
+def parse_rate(rate):
+    """Parse positive download rate with optional `K`, `M` or `G` suffix."""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    try:
+        if rate[-1:].upper() in units:
+            value = float(rate[:-1]) * units[rate[-1].upper()]
+        else:
+            value = float(rate)
+    except ValueError:
+        raise ArgumentTypeError(f"rate:{rate} is not valid.") from None
+
+    if not value > 0:
+        raise ArgumentTypeError(f"rate:{rate} must be positive.")
+    return value
+
+def print_limits(redl: 'RedditDownloader') -> None:
+    """Print adaptive concurrency limits of hosts."""
+    limits = redl.concurrency_limits()
+    if limits:
+        print('\nConcurrency: ' + ', '.join(
+            f"{host}={_['limit']}" for host, _ in sorted(limits.items())))
+
+def _main(redl: 'RedditDownloader', targetlist: List[str]) -> None:
 
     for target in targetlist:
         print(f'Downloading: {urlparse(target).path}')
@@ -68,6 +95,7 @@ def _main(redl: RedditDownloader, targetlist: List[str]) -> None:
         except ConnectionException:
             if redl.raise_exception:
                 raise
+        print_limits(redl)
 
 def main():
     """Entry point for cli."""
@@ -99,6 +127,9 @@ def main():
 
         g_post = parser.add_argument_group("What to Download of each Post")
         g_post.add_argument('--metadata-json', action='store_true', help=SUPPRESS)
+        g_post.add_argument(
+            '-C', '--comments', action='store_true',
+            help='For post urls, also download media linked in comments.')
         g_post.add_argument(
             '-V', '--no-videos', action='store_true', help='Do not download videos.')
         g_post.add_argument(
@@ -112,6 +143,20 @@ def main():
         g_cond.add_argument(
             '--update', action='store_true',
             help='For each target, stop when encountering the first already-downloaded content.')
+        g_cond.add_argument(
+            '--verify', action='store_true',
+            help='Check files of targets against their manifest and re-download '
+                 'missing or corrupted ones, without crawling.')
+        g_cond.add_argument(
+            '--retry-missing', action='store_true',
+            help='Re-download failed or unfinished media from --post-store, without crawling. '
+                 'Filtered by --user and --reddit if given.')
+        g_cond.add_argument(
+            '--watch', action='store_true',
+            help='Keep polling targets for new posts. Active targets are polled more often.')
+        g_cond.add_argument(
+            '--watch-interval', metavar='N', type=float, default=WATCH_MIN_INTERVAL,
+            help=f'Minimum seconds between polls of a target. Defaults to {WATCH_MIN_INTERVAL}.')
 
         g_how = parser.add_argument_group('How to Download')
         g_how.add_argument('--user-agent', help='User Agent to use for HTTP requests.')
@@ -121,9 +166,28 @@ def main():
         g_how.add_argument(
             '--max-connection-attempts', metavar='N', type=int, default=3,
             help='Maximum number of connection attempts until a request is aborted.')
+        g_how.add_argument(
+            '--limit-rate', metavar='RATE', type=parse_rate,
+            help='Maximum download rate in bytes per second. Exp. `500K`, `2M`.')
+        g_how.add_argument(
+            '--segments', metavar='N', type=int, default=1,
+            help='Download files larger than 64 MB in N parallel parts. Defaults to 1.')
+        g_how.add_argument(
+            '--cache-dir', metavar='DIR',
+            help='Directory to cache listing pages and dead media urls in, for faster updates. '
+                 'Disabled by default.')
+        g_how.add_argument(
+            '--post-store', metavar='FILE',
+            help='Save posts and status of their media to SQLite database FILE.')
         g_how.add_argument('-S', '--no-sleep', action='store_true', help=SUPPRESS)
         
         args = parser.parse_args(args=None if sys.argv[1:] else ['--help'])
+        if args.retry_missing and not args.post_store:
+            parser.error('--retry-missing requires --post-store.')
+        # pylint: disable=import-outside-toplevel
+        from .reddit_dl import RedditDownloader
+        from .watch import watch
+
         url_list = [
             *build_url(args.user, 'user'),
             *build_url(args.reddit, 'reddit'),
@@ -140,9 +204,26 @@ def main():
             max_connection_attempts=args.max_connection_attempts,
             request_timeout=args.request_timeout,
             download_nsfw=not args.no_nsfw,
-            update_mode=args.update)
-
-        _main(redl, url_list)
+            update_mode=args.update,
+            cache_dir=args.cache_dir,
+            download_comments=args.comments,
+            post_store=args.post_store,
+            segments=args.segments,
+            limit_rate=args.limit_rate)
+
+        if args.retry_missing:
+            for author in args.user or [None]:
+                for subreddit in args.reddit or [None]:
+                    print(f'\nRetried {redl.download_missing(author, subreddit)} files.')
+        elif args.verify:
+            for url in url_list:
+                print(f'Verifying: {urlparse(url).path}')
+                print(f'\nRepaired {redl.verify(url)} files.')
+        elif args.watch:
+            watch(redl, url_list, min_interval=args.watch_interval,
+                  max_interval=max(args.watch_interval, WATCH_MAX_INTERVAL))
+        else:
+            _main(redl, url_list)
 
     except KeyboardInterrupt:
         print('Keyboard interrupt, exiting.')
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.cache: on-disk caches."""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional
+
+from .utils import write_json
+from .constants import NEGATIVE_CACHE_TTL
+
+
+class HttpCache:
+    """On-disk HTTP cache for listing pages.
+
+    Stores `ETag`, `Last-Modified`, body hash and parsed posts per url,
+    so unchanged pages are neither downloaded nor parsed again."""
+
+    def __init__(self, cache_dir: str):
+        self.path = os.path.join(cache_dir, 'http')
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file_path(self, url: str) -> str:
+        return os.path.join(self.path, hashlib.sha1(url.encode()).hexdigest() + '.json')
+
+    def get(self, url: str) -> Optional[dict]:
+        """Returns cached entry of url, if not exist returns None."""
+        try:
+            with open(self._file_path(url), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, url: str, entry: dict) -> None:
+        """Save entry of url."""
+        write_json(self._file_path(url), entry)
+
+    @staticmethod
+    def conditional_headers(entry: Optional[dict]) -> dict:
+        """Returns headers for conditional request of cached entry."""
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    @staticmethod
+    def body_hash(content: bytes) -> str:
+        """Returns hash of response body."""
+        return hashlib.sha1(content).hexdigest()
+
+class NegativeCache:
+    """On-disk cache of dead media urls. Exp. deleted redgifs,
+    removed imgur media or 404 files. Entries expire after `ttl` seconds."""
+
+    def __init__(self, cache_dir: str, ttl: float = NEGATIVE_CACHE_TTL):
+        self.path = os.path.join(cache_dir, 'negative.json')
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._changed = False
+        os.makedirs(cache_dir, exist_ok=True)
+
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+        # Drop expired entries
+        now = time.time()
+        self.entries = {key: exp for key, exp in self.entries.items() if exp > now}
+
+    def __contains__(self, key: str) -> bool:
+        expires = self.entries.get(key)
+        return bool(expires) and expires > time.time()
+
+    def add(self, key: str) -> None:
+        """Mark url or media id as dead."""
+        with self._lock:
+            self.entries[key] = time.time() + self.ttl
+            self._changed = True
+
+    def save(self) -> None:
+        """Write cache to disk if changed."""
+        with self._lock:
+            if self._changed:
+                write_json(self.path, self.entries)
+                self._changed = False
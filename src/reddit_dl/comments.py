@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.comments: link extraction from comment threads."""
+
+import re
+import html
+from typing import Optional
+
+
+RGX_COMMENTS_URL = re.compile(r'/(r|reddit|u|user)+/[a-zA-Z_0-9-]+/comments')
+RGX_MORECHILDREN = re.compile(
+    r"morechildren\(this,\s*'([^']*)',\s*'([^']*)',\s*'([^']*)'")
+
+def is_comments_url(url: str) -> bool:
+    """Check url is a post page with comments."""
+    return bool(re.search(RGX_COMMENTS_URL, url))
+
+def parse_comments(page_html: str, is_page: bool = True) -> dict:
+    """Extract links of comments, `load more comments` and
+    `continue this thread` links from html.
+
+    If `is_page` only comment area of page is parsed, so post and
+    sidebar are not built into the tree.
+
+    Returns ``{'links': [(comment_id, url)], 'more': [(link_id, sort,
+    children)], 'threads': [url]}``"""
+    from bs4 import BeautifulSoup, SoupStrainer  # pylint: disable=import-outside-toplevel
+
+    strainer = SoupStrainer('div', class_='commentarea') if is_page else None
+    soup = BeautifulSoup(page_html, 'html.parser', parse_only=strainer)
+    data = {'links': [], 'more': [], 'threads': []}
+
+    for comment in soup.find_all('div', class_='comment'):
+        entry = comment.find('div', class_='entry', recursive=False)
+        body = entry.find('div', class_='md') if entry else None
+        if not body:
+            continue
+
+        comment_id = comment.get('data-fullname')
+        for a_tag in body.find_all('a', href=True):
+            if a_tag['href'].startswith(('http://', 'https://')):
+                data['links'].append((comment_id, a_tag['href']))
+
+    for a_tag in soup.select('span.morecomments a'):
+        more = re.search(RGX_MORECHILDREN, a_tag.get('onclick', ''))
+        if more:
+            link_id, sort, children = more.groups()
+            data['more'].append((link_id, sort, [_ for _ in children.split(',') if _]))
+
+    for a_tag in soup.select('span.deepthread a'):
+        if a_tag.get('href'):
+            data['threads'].append(a_tag['href'])
+
+    return data
+
+def parse_more_children(res_json: dict) -> str:
+    """Returns html of comments from `/api/morechildren` response."""
+
+    try:
+        things = res_json['json']['data']['things']
+    except (KeyError, TypeError):
+        return ''
+
+    return ''.join(html.unescape(_['data'].get('content', '')) for _ in things)
+
+def link_post_data(
+        comment_id: Optional[str], index: int, url: str, nsfw: bool) -> dict:
+    """Returns post data for link in comment, for download pipeline."""
+
+    return {
+        'id': f'{comment_id}_{index}' if comment_id else None,
+        'url': url,
+        'kind': None,
+        'is_reddit_video': False,
+        'nsfw': nsfw,
+        'timestamp': None,
+        'is_gallery': False,
+        'cached_html': None,
+        'title': f'Comment {comment_id}',
+    }
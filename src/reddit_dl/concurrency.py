@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.concurrency: adaptive per host concurrency limits."""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from urllib.parse import urlparse
+
+import requests
+from urllib3.exceptions import HTTPError as Urllib3Error
+
+from .constants import (
+    CONCURRENCY_INITIAL, CONCURRENCY_MIN, CONCURRENCY_MAX, CONCURRENCY_LATENCY_FACTOR)
+
+
+class _HostState:
+    """Limit and statistics of a host."""
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.active = 0
+        self.latency = None
+        self.min_latency = None
+        self.throughput = 0.0
+        self.errors = 0
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+
+class ConcurrencyController:
+    """AIMD controller of concurrent requests per host.
+
+    Limit of a host increases by `1 / limit` on each fast success, so
+    about one per window of requests. It's halved on `429`, `5xx` or
+    connection errors, at most once per observed latency. Success with
+    latency bigger than `latency_factor` times the best seen latency
+    doesn't increase the limit, host is likely saturated.
+
+    Throughput is tracked for `limits()` only, latency is the saturation
+    signal. Per request throughput depends on file sizes, which vary too
+    much between posts to steer the limit."""
+
+    def __init__(
+            self,
+            initial: float = CONCURRENCY_INITIAL,
+            minimum: float = CONCURRENCY_MIN,
+            maximum: float = CONCURRENCY_MAX,
+            latency_factor: float = CONCURRENCY_LATENCY_FACTOR):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> _HostState:
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = _HostState(self.initial)
+            return self._hosts[host]
+
+    def limit(self, host: str) -> int:
+        """Returns current concurrency limit of host."""
+        return int(self._state(host).limit)
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[dict]:
+        """Wait for a free slot of url's host, hold it in context.
+        Set `status`, `bytes` and `latency` (time to first byte)
+        of yielded dict for feedback. Only network errors count as
+        errors of host, others (exp. full disk) just release slot."""
+
+        state = self._state(urlparse(url).netloc)
+        with state.cond:
+            while state.active >= int(state.limit):
+                state.cond.wait()
+            state.active += 1
+
+        outcome = {'status': None, 'bytes': 0, 'latency': None}
+        started = time.monotonic()
+        try:
+            yield outcome
+        except (requests.exceptions.RequestException, Urllib3Error):
+            self._on_error(state)
+            raise
+        else:
+            status = outcome['status'] or 0
+            if status == 429 or status >= 500:
+                self._on_error(state)
+            else:
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self._on_success(
+                    state, outcome['latency'] or elapsed, outcome['bytes'] / elapsed)
+        finally:
+            with state.cond:
+                state.active -= 1
+                state.cond.notify_all()
+
+    def _on_success(self, state: _HostState, latency: float, throughput: float):
+        with state.cond:
+            state.latency = latency if state.latency is None else (
+                0.8 * state.latency + 0.2 * latency)
+            state.min_latency = latency if state.min_latency is None else (
+                min(state.min_latency, latency))
+            state.throughput = 0.8 * state.throughput + 0.2 * throughput
+
+            if latency <= state.min_latency * self.latency_factor:
+                state.limit = min(self.maximum, state.limit + 1 / state.limit)
+            state.cond.notify_all()
+
+    def _on_error(self, state: _HostState):
+        with state.cond:
+            state.errors += 1
+            now = time.monotonic()
+            if now - state.last_decrease > (state.latency or 1.0):
+                state.limit = max(self.minimum, state.limit / 2)
+                state.last_decrease = now
+
+    def limits(self) -> dict:
+        """Returns current limit, latency, throughput and errors of hosts."""
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            host: {
+                'limit': int(state.limit),
+                'latency': state.latency,
+                'throughput': state.throughput,
+                'errors': state.errors,
+            }
+            for host, state in hosts.items()
+        }
+
+class AdaptiveSession(requests.Session):
+    """Session which runs requests in slots of `ConcurrencyController`.
+    Streamed requests are not limited here, their reader must hold
+    a slot for the whole transfer."""
+
+    def __init__(self, controller: ConcurrencyController):
+        super().__init__()
+        self.controller = controller
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        if kwargs.get('stream'):
+            return super().request(method, url, *args, **kwargs)
+
+        with self.controller.slot(url) as outcome:
+            res = super().request(method, url, *args, **kwargs)
+            outcome['status'] = res.status_code
+            outcome['bytes'] = len(res.content)
+            outcome['latency'] = res.elapsed.total_seconds()
+            return res
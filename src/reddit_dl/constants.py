@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import os
+
 USERAGENTS = [
   "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
   "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 Edg/114.0.1823.67",
@@ -152,4 +154,46 @@ ALLOWED_URLS = [
     "https://libreddit.tux.pizza"
 ]
 
-TIMEOUT = 50
\ No newline at end of file
+TIMEOUT = 50
+
+RESOLVER_WORKERS = 4
+
+WATCH_MIN_INTERVAL = 60
+
+WATCH_MAX_INTERVAL = 3600
+
+CHUNK_SIZE_MIN = 64 * 1024
+
+CHUNK_SIZE_MAX = 4 * 1024 * 1024
+
+SEGMENT_MIN_SIZE = 64 * 1024 * 1024
+
+FAST_LANE_WORKERS = 16
+
+SLOW_LANE_WORKERS = 2
+
+LARGE_FILE_SIZE = 20 * 1024 * 1024
+
+MANIFEST_NAME = '.reddit-dl-manifest.json'
+
+VERIFY_WORKERS = os.cpu_count() or 4
+
+MERGE_WORKERS = os.cpu_count() or 2
+
+NEGATIVE_CACHE_TTL = 7 * 24 * 60 * 60
+
+COMMENTS_LIMIT = 500
+
+MORECHILDREN_BATCH = 100
+
+CONCURRENCY_INITIAL = 2
+
+CONCURRENCY_MIN = 1
+
+CONCURRENCY_MAX = 16
+
+CONCURRENCY_LATENCY_FACTOR = 2.0
+
+RETRY_AFTER_MAX = 60
+
+RESOLVED_CACHE_SIZE = 10000
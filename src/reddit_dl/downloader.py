@@ -5,16 +5,25 @@
 import os
 import re
 import subprocess
+import threading
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from random import choice
 from urllib.parse import urlparse, unquote, urljoin, urlunparse
 from pathlib import PurePosixPath
-from typing import Optional
+from typing import Callable, Iterator, Optional
 
 import requests
-import m3u8
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
 
 from .utils import url_to_filename
-from .constants import USERAGENTS, TIMEOUT
+from .constants import (
+    USERAGENTS, TIMEOUT, CHUNK_SIZE_MIN, CHUNK_SIZE_MAX, SEGMENT_MIN_SIZE, MERGE_WORKERS,
+    LARGE_FILE_SIZE)
+from .exceptions import BadResponseException, LargeFileException
+from .scheduler import RateLimiter, in_fast_lane
+from .cache import NegativeCache
+from .concurrency import ConcurrencyController
 
 
 HEADERS = {
@@ -25,6 +34,8 @@ HEADERS = {
 
 def hls_extractor(url: str) -> list:
     """Download hls videos."""
+    import m3u8  # pylint: disable=import-outside-toplevel
+
     playlist = m3u8.load(url)
     parsed = urlparse(url)._replace(query='', params='', fragment='')
 
@@ -69,78 +80,349 @@ def hls_extractor(url: str) -> list:
 
     return hls_data
 
+def _ffmpeg(inputs: list, codecs: list, output: str) -> bool:
+    """Run ffmpeg, returns True if output is created."""
+
+    cmd = ['ffmpeg', '-loglevel', 'panic', '-y']
+    for input_ in inputs:
+        cmd += ['-i', input_]
+
+    try:
+        return_code = subprocess.call([*cmd, *codecs, output])
+    except OSError:
+        # ffmpeg is not installed
+        return False
+
+    if return_code and os.path.exists(output):
+        os.remove(output)
+    return os.path.exists(output)
+
 def merge_hls(
         output: str,
         video: str,
         audio: Optional[str] = None,
-        ):
-    """Merge audio and video file.
+        ) -> bool:
+    """Merge audio and video file. Streams are copied when codecs fit
+    to output container, otherwise audio is encoded to aac and video
+    is converted. Returns True if merged.
 
     :param output: Output file full path. exp. /home/sky/funny_video.mp4
     :param video: Video file full path. exp. /home/sky/video.webm
     :param audio: Audio file full path. exp. /home/sky/audio.mp3"""
 
     if audio and video:
-        cmd = f'ffmpeg -loglevel panic -i "{video}" -i "{audio}" -c:v copy -c:a aac "{output}"'
-        subprocess.call(cmd, shell=True)
-        if os.path.exists(output):
+        merged = (_ffmpeg([video, audio], ['-c', 'copy'], output)
+                  or _ffmpeg([video, audio], ['-c:v', 'copy', '-c:a', 'aac'], output))
+        if merged:
             os.remove(video)
             os.remove(audio)
-    elif video:
-        cmd = f'ffmpeg -loglevel panic -i "{video}" {output}'
-        subprocess.call(cmd, shell=True)
-        if os.path.exists(output):
+        return merged
+
+    if video:
+        merged = _ffmpeg([video], ['-c', 'copy'], output) or _ffmpeg([video], [], output)
+        if merged:
             os.remove(video)
+        return merged
+
+    return False
+
+class MergePool:
+    """Runs `merge_hls` in worker threads, so downloads
+    don't wait for ffmpeg. Failures don't block other merges.
+    `on_merged` callbacks run in the worker too, so `join()`
+    waits for them."""
+
+    def __init__(self, workers: int = MERGE_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def submit(
+            self, on_merged: Optional[Callable[[Optional[str]], None]] = None,
+            **to_merged) -> Future:
+        """Schedule merge, returns `Future` of output path, which is
+        None if merging failed. `on_merged` is called with it."""
+
+        future = self._executor.submit(self._merge, on_merged, **to_merged)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def join(self):
+        """Wait for all scheduled merges. Errors of `on_merged`
+        callbacks are printed, so they don't stop other merges."""
+        with self._lock:
+            futures, self._futures = self._futures, []
+        wait(futures)
+
+        for future in futures:
+            if future.exception():
+                print(f'Finishing merged media failed: {future.exception()}')
+
+    @staticmethod
+    def _merge(
+            on_merged: Optional[Callable[[Optional[str]], None]],
+            **to_merged) -> Optional[str]:
+        try:
+            output = to_merged['output'] if merge_hls(**to_merged) else None
+        except Exception as err:  # pylint: disable=broad-except
+            # Exp. removing merged tracks failed, `on_merged` still gets called
+            print(f'Merging failed: {to_merged["output"]}: {err}')
+            output = None
+        else:
+            if not output:
+                print(f'Merging failed: {to_merged["output"]}')
+
+        if on_merged:
+            on_merged(output)
+        return output
+
+def _content_length(res: requests.Response) -> int:
+    """Returns size of response body on disk, 0 if unknown."""
+    if res.headers.get('Content-Encoding', 'identity') != 'identity':
+        return 0
+    try:
+        return int(res.headers.get('Content-Length', 0))
+    except ValueError:
+        return 0
+
+def _chunk_size(size: int) -> int:
+    """Returns chunk size for file with given size. Bigger files
+    get bigger chunks, so they need less read and write calls."""
+    if not size:
+        return CHUNK_SIZE_MIN
+    return min(max(size // 64, CHUNK_SIZE_MIN), CHUNK_SIZE_MAX)
+
+def _preallocate(file, size: int):
+    """Reserve disk space for file, where it is supported."""
+    if size and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(file.fileno(), 0, size)
+        except OSError:
+            pass
+
+def _remove(path: str):
+    """Remove file if it exists."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _read_chunks(raw, chunk_size: int) -> Iterator:
+    """Yields decoded chunks of raw response stream. Not encoded
+    streams are read into a reusable buffer."""
+
+    if raw.headers.get('Content-Encoding', 'identity') != 'identity':
+        # `readinto` may return 0 before end of an encoded stream,
+        # when a chunk decodes to nothing. `stream` reads until end.
+        yield from raw.stream(chunk_size, decode_content=True)
+        return
+
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        read = raw.readinto(buffer)
+        if not read:
+            return
+        yield view[:read]
+
+def _copy_stream(
+        raw, file, chunk_size: int, rate_limiter: Optional[RateLimiter] = None,
+        expected: int = 0) -> int:
+    """Copy raw response stream to file. Returns number of copied bytes.
+    Raises requests exceptions like `iter_content` does, also if less
+    than `expected` bytes arrived."""
+    raw.decode_content = True
+    copied = 0
+
+    try:
+        for chunk in _read_chunks(raw, chunk_size):
+            file.write(chunk)
+            copied += len(chunk)
+            if rate_limiter:
+                rate_limiter.consume(len(chunk))
+    except ProtocolError as err:
+        raise requests.exceptions.ChunkedEncodingError(err) from err
+    except DecodeError as err:
+        raise requests.exceptions.ContentDecodingError(err) from err
+    except ReadTimeoutError as err:
+        raise requests.exceptions.ConnectionError(err) from err
+
+    if copied < expected:
+        raise requests.exceptions.ChunkedEncodingError(
+            f'Connection closed after {copied} of {expected} bytes.')
+    return copied
 
 class Downloader:
     """Simple downloader"""
     def __init__(
             self, update_mode: bool = False, request_timeout: int = TIMEOUT,
-            raise_exception: bool = True, headers: Optional[dict] = None,):
+            raise_exception: bool = True, headers: Optional[dict] = None,
+            session: Optional[requests.Session] = None, segments: int = 1,
+            rate_limiter: Optional[RateLimiter] = None,
+            merge_pool: Optional[MergePool] = None,
+            negative_cache: Optional[NegativeCache] = None,
+            controller: Optional[ConcurrencyController] = None,
+            large_size: int = LARGE_FILE_SIZE):
         self.update_mode = update_mode
         self.request_timeout = request_timeout
         self.raise_exception = raise_exception
         self.headers = headers if headers else HEADERS
+        self.session = session if session else requests.Session()
+        self.segments = segments
+        self.rate_limiter = rate_limiter
+        self.merge_pool = merge_pool if merge_pool else MergePool()
+        self.negative_cache = negative_cache
+        self.controller = controller
+        self.large_size = large_size
 
     def download(
             self, url: str, path: Optional[str] = None,
-            headers: Optional[dict] = None, output_format: str='mp4'):
+            headers: Optional[dict] = None, output_format: str='mp4',
+            filename: Optional[str] = None,
+            on_merged: Optional[Callable[[Optional[str]], None]] = None):
         """Public method for Downloader Class. Detects given
-        url type (hls or not) and downloads it."""
-
-        if headers:
-            self.headers = headers
+        url type (hls or not) and downloads it. Returns full
+        path of downloaded file, or None if nothing is downloaded.
+        For hls returns `Future` of path, done when merging is done,
+        `on_merged` is called with path in merge worker.
+        `filename` overrides name from url, except for hls."""
 
+        headers = headers if headers else self.headers
         path = path if path else os.getcwd()
 
+        # Known dead media
+        if self.negative_cache is not None and url in self.negative_cache:
+            return None
+
         # Check is hls
         if re.search(r'.m3u8(\?+|$)', url):
-            return self._hls_downloader(url, path, output_format)
-        return self._downloader(url, path)
+            return self._hls_downloader(url, path, headers, output_format, on_merged)
+        return self._downloader(url, path, headers, filename)
 
     def _downloader(
-            self, url, path: str):
+            self, url, path: str, headers: dict,
+            filename: Optional[str] = None, _segmented: bool = True):
         """Download video, image or gif."""
 
-        file_name = url_to_filename(url)
+        file_name = filename or url_to_filename(url)
         full_path = os.path.join(path, file_name)
 
-        with requests.get(
-            url, stream=True, headers=self.headers, timeout=self.request_timeout) as res:
-            if not res.status_code == 404 and self.raise_exception:
+        with self._slot(url) as outcome, self.session.get(
+                url, stream=True, headers=headers, timeout=self.request_timeout) as res:
+            outcome['status'] = res.status_code
+            outcome['latency'] = res.elapsed.total_seconds()
+
+            if res.status_code in [404, 410]:
+                self._mark_dead(url)
+                return None
+
+            if self.raise_exception:
                 res.raise_for_status()
 
             # If last part of url has changed, than return
+            # Exp. imgur redirects removed media to `removed.png`
             res_url = PurePosixPath(unquote(urlparse(res.url).path)).parts[-1]
             req_url = PurePosixPath(unquote(urlparse(url).path)).parts[-1]
 
-            if res_url == req_url:
-                with open(full_path, 'wb') as file:
-                    for chunk in res.iter_content(chunk_size=8192):
-                        file.write(chunk)
+            if res_url != req_url:
+                self._mark_dead(url)
+                return None
+
+            size = _content_length(res)
+            # Size is known from headers, large files leave fast lane
+            # of scheduler, so small ones don't wait behind them
+            if size > self.large_size and in_fast_lane():
+                raise LargeFileException(f'{url} is {size} bytes.')
+
+            segmented = (_segmented and self.segments > 1 and size >= SEGMENT_MIN_SIZE
+                         and res.headers.get('Accept-Ranges') == 'bytes')
+
+            if not segmented:
+                # Partial files never get the final name
+                part_path = f'{full_path}.part'
+                try:
+                    with open(part_path, 'wb') as file:
+                        _preallocate(file, size)
+                        outcome['bytes'] = _copy_stream(
+                            res.raw, file, _chunk_size(size), self.rate_limiter, size)
+                        file.truncate()
+                    os.replace(part_path, full_path)
+                except BaseException:
+                    _remove(part_path)
+                    raise
+                return full_path
+
+        # Segments take their own slots, so this one is released first
+        try:
+            return self._segmented_downloader(res.url, full_path, size, headers)
+        except BadResponseException:
+            # Server ignored `Range`, fallback to single stream
+            return self._downloader(url, path, headers, filename, _segmented=False)
+
+    def _slot(self, url: str):
+        """Returns concurrency slot context of url's host."""
+        if self.controller:
+            return self.controller.slot(url)
+        return nullcontext({})
+
+    def _mark_dead(self, url: str):
+        """Remember url is dead, if negative cache is enabled."""
+        if self.negative_cache is not None:
+            self.negative_cache.add(url)
+
+    def _segmented_downloader(self, url: str, full_path: str, size: int, headers: dict):
+        """Download file in `self.segments` parallel `Range` requests."""
+
+        part_path = f'{full_path}.part'
+        step = -(-size // self.segments)
+        ranges = [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+
+        try:
+            with open(part_path, 'wb') as file:
+                _preallocate(file, size)
+                file.truncate(size)
+
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [
+                    executor.submit(
+                        self._download_segment, url, part_path, start, end, headers)
+                    for start, end in ranges]
+                for future in futures:
+                    future.result()
+
+            os.replace(part_path, full_path)
+        except BaseException:
+            _remove(part_path)
+            raise
+
+        return full_path
+
+    def _download_segment(
+            self, url: str, full_path: str, start: int, end: int, headers: dict):
+        """Download bytes from `start` to `end` into file at same offset."""
+
+        headers = {**headers, 'Range': f'bytes={start}-{end}'}
+        with self._slot(url) as outcome, self.session.get(
+                url, stream=True, headers=headers, timeout=self.request_timeout) as res:
+            outcome['status'] = res.status_code
+            outcome['latency'] = res.elapsed.total_seconds()
+            outcome['bytes'] = end - start + 1
+
+            if self.raise_exception:
+                res.raise_for_status()
+            if res.status_code != 206:
+                raise BadResponseException(f'Range is not supported for {url}')
+
+            with open(full_path, 'r+b') as file:
+                file.seek(start)
+                _copy_stream(
+                    res.raw, file, _chunk_size(end - start + 1), self.rate_limiter,
+                    end - start + 1)
 
     def _hls_downloader(
-            self, url: str, path: str, output_format: str='mp4'):
+            self, url: str, path: str, headers: dict, output_format: str='mp4',
+            on_merged: Optional[Callable[[Optional[str]], None]] = None):
         """Downloads hls media."""
 
         file_name = url_to_filename(url)
@@ -157,12 +439,14 @@ class Downloader:
 
             with open(f"{media_path}.{data['type']}", "wb") as file:
                 for url_ in data['segment_urls']:
-                    res =  requests.get(url_, timeout=self.request_timeout, headers=self.headers)
+                    res =  self.session.get(url_, timeout=self.request_timeout, headers=headers)
 
                     if res.ok:
                         file.write(res.content)
+                        if self.rate_limiter:
+                            self.rate_limiter.consume(len(res.content))
                     elif self.raise_exception:
                         res.raise_for_status()
 
         # Finally merge or convert to .mp4
-        merge_hls(**to_merged)
+        return self.merge_pool.submit(on_merged, **to_merged)
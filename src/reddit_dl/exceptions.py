@@ -12,5 +12,11 @@ class ConnectionException(RedditDlException):
 class BadResponseException(RedditDlException):
     pass
 
+class LargeFileException(RedditDlException):
+    """Large file is found in fast lane, its job moves to slow lane."""
+    pass
+
 class ExistFileOnUpdateModeException(RedditDlException):
-    pass
\ No newline at end of file
+    """Update mode reached already downloaded content.
+    `new_posts` is number of posts crawled until then."""
+    new_posts = 0
\ No newline at end of file
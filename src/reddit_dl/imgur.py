@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+"""imgur.com Related Module"""
+
+import re
+
+
+IMGUR_REMOVED_URL = 'https://i.imgur.com/removed.png'
+
+def get_imgur_video(url: str) -> str:
+    """Returns downloadable video url from imgur `.gifv` url.
+
+    `.gifv` is just a html wrapper around `.mp4` on imgur, so no request is
+    needed here. Removed media is detected by the download request itself,
+    imgur redirects it to `IMGUR_REMOVED_URL` and `Downloader` skips it."""
+
+    return re.sub(r'\.gifv(?=[?#]|$)', '.mp4', url)
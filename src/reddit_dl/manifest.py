@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.manifest: per folder manifest of downloaded media."""
+
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .utils import write_json
+from .constants import MANIFEST_NAME, VERIFY_WORKERS
+
+
+def file_hash(path: str) -> str:
+    """Returns sha256 hex digest of file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class Manifest:
+    """Manifest of a download folder.
+
+    Maps post id -> media url -> `filename`, `size` and `sha256` of file,
+    so folder can be verified and repaired without crawling."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.posts = {}
+        self._lock = threading.Lock()
+        self._changed = False
+
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                self.posts = json.load(file)['posts']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def has(self, post_id: Optional[str], url: str) -> bool:
+        """Check media url of post is in manifest."""
+        return url in self.posts.get(post_id or '', {})
+
+    def add(self, post_id: Optional[str], url: str, path: str):
+        """Add downloaded file of post to manifest."""
+
+        entry = {
+            'filename': os.path.relpath(path, self.folder),
+            'size': os.path.getsize(path),
+            'sha256': file_hash(path),
+        }
+        with self._lock:
+            self.posts.setdefault(post_id or '', {})[url] = entry
+            self._changed = True
+
+    def save(self):
+        """Write manifest to folder if changed."""
+        with self._lock:
+            if self._changed:
+                write_json(self.path, {'posts': self.posts})
+                self._changed = False
+
+    def verify(self, workers: int = VERIFY_WORKERS) -> List[tuple]:
+        """Check files of manifest in parallel. Returns `(post_id, url, entry)`
+        of missing, truncated or corrupted files."""
+
+        entries = [(post_id, url, entry)
+                   for post_id, urls in self.posts.items()
+                   for url, entry in urls.items()]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            valids = list(executor.map(self._is_valid, [_[2] for _ in entries]))
+
+        return [entry for entry, valid in zip(entries, valids) if not valid]
+
+    def _is_valid(self, entry: dict) -> bool:
+        path = os.path.join(self.folder, entry['filename'])
+        try:
+            if os.path.getsize(path) != entry['size']:
+                return False
+        except OSError:
+            return False
+        return file_hash(path) == entry['sha256']
@@ -5,21 +5,39 @@
 import os
 import re
 import time
-from functools import wraps
-from typing import Callable, Optional
-from urllib.parse import urlparse, unquote, urlunparse, parse_qsl, urlencode
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial, wraps
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, Tuple, Union
+from urllib.parse import urlparse, unquote, urlunparse, parse_qsl, urlencode, urljoin
 from pathlib import PurePosixPath
 from random import expovariate, choice
 
 from requests import Response
 import requests
-from bs4 import BeautifulSoup
 
 from .downloader import Downloader
-from .utils import url_to_filename
-from .exceptions import ConnectionException, ExistFileOnUpdateModeException
-from .constants import USERAGENTS
+from .utils import url_to_filename, is_chronological_url
+from .exceptions import (
+    ConnectionException, ExistFileOnUpdateModeException, LargeFileException)
+from .constants import (
+    USERAGENTS, RESOLVER_WORKERS, COMMENTS_LIMIT, MORECHILDREN_BATCH, RETRY_AFTER_MAX,
+    RESOLVED_CACHE_SIZE)
 from .redgifs import get_redgifs_token, get_redgifs_video
+from .streamable import get_streamable_video
+from .resolvers import get_resolver
+from .cache import HttpCache, NegativeCache
+from .scheduler import DownloadScheduler, RateLimiter
+from .results import DownloadResult
+from .manifest import Manifest
+from .store import PostStore
+from .concurrency import ConcurrencyController, AdaptiveSession
+from .comments import is_comments_url, parse_comments, parse_more_children, link_post_data
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 
 __version__ = "0.0.1"
@@ -43,20 +61,21 @@ def print_download_message(o_str: Optional[str] = None, post_data: Optional[dict
 
     print(o_str, end='\r', flush=True)
 
+RGX_IMG_CMP = re.compile(r'.(jpeg|jpg|png|tiff)(\?+|$)')
+RGX_GIF_CMP = re.compile(r'.(gif)(\?+|$)')
+RGX_VD_CMP = re.compile(r'.(mp4|gifv|m3u8)(\?+|$)')
+
 def is_download_url(url, type_):
     """Check is url have file extension."""
-    rgx_img_cmp = re.compile(r'.(jpeg|jpg|png|tiff)(\?+|$)')
-    rgx_gif_cmp = re.compile(r'.(gif)(\?+|$)')
-    rgx_vd_cmp = re.compile(r'.(mp4|gifv|m3u8)(\?+|$)')
 
     if type_ == 'image':
-        return re.search(rgx_img_cmp, url)
+        return re.search(RGX_IMG_CMP, url)
 
     if type_ == 'gif':
-        return re.search(rgx_gif_cmp, url)
+        return re.search(RGX_GIF_CMP, url)
 
     if type_ == 'video':
-        return re.search(rgx_vd_cmp, url)
+        return re.search(RGX_VD_CMP, url)
 
     return None
 
@@ -81,7 +100,7 @@ def _retry_on_connection_error(func: Callable) -> Callable:
                     kwargs['_attempt'] += 1
                 else:
                     kwargs['_attempt'] = 2
-                redl._do_sleep()
+                redl._do_sleep(err)
                 return call(redl, *args, **kwargs)
             except ConnectionException:
                 raise ConnectionException(error_string) from None
@@ -114,6 +133,28 @@ def _update_exist_error_handler(func: Callable) -> Callable:
                 raise ConnectionException(error_string) from None
     return call
 
+def _until_last_seen(
+        posts_data: list, last_seen: tuple, chronological: bool = True) -> Tuple[list, bool]:
+    """Returns posts newer than `last_seen` post and whether it is reached.
+
+    On chronological listings also stops on older posts, in case of last
+    seen post was deleted. Other listings (exp. hot, top) and stickied
+    posts are out of order, their posts are filtered by time only."""
+
+    last_id, last_timestamp = last_seen
+    newer = []
+    for post_data in posts_data:
+        timestamp = int(post_data['timestamp'] or 0)
+        if post_data.get('stickied') or not chronological:
+            if timestamp > last_timestamp:
+                newer.append(post_data)
+            continue
+
+        if post_data['id'] == last_id or (timestamp and timestamp < last_timestamp):
+            return newer, True
+        newer.append(post_data)
+    return newer, False
+
 class RedditDownloader:
     """RedditDownload Class.
 
@@ -133,7 +174,14 @@ class RedditDownloader:
             request_timeout: float = 300.0,
             search_string: Optional[str] = None,
             update_mode: bool = False,
-            raise_exception: bool = False):
+            raise_exception: bool = False,
+            cache_dir: Optional[str] = None,
+            segments: int = 1,
+            limit_rate: Optional[float] = None,
+            progress: Optional[Callable[[DownloadResult], None]] = None,
+            quiet: bool = False,
+            download_comments: bool = False,
+            post_store: Optional[str] = None):
 
         self.sleep = sleep
         self.user_agent = user_agent
@@ -147,18 +195,127 @@ class RedditDownloader:
         self.search_string = search_string
         self.update_mode = update_mode
         self.raise_exception = raise_exception
+        self.cache_dir = cache_dir
+        self.segments = segments
+        self.limit_rate = limit_rate
+        self.progress = progress
+        self.quiet = quiet
+        self.download_comments = download_comments
+        self.post_store = PostStore(post_store) if post_store else None
+
+        self.http_cache = HttpCache(cache_dir) if cache_dir else None
+        self.negative_cache = NegativeCache(cache_dir) if cache_dir else None
+        self.controller = ConcurrencyController()
+        self.session = AdaptiveSession(self.controller)
+        self._resolved = OrderedDict()
+        self._resolved_lock = threading.Lock()
+        self._last_seen = {}
+        self._listeners = []
+        self._manifests = {}
+        self._manifests_lock = threading.Lock()
+        self._resolver_pool = None
 
         self.downloader = Downloader(
-            self.update_mode, self.request_timeout, self.raise_exception)
-
-    def _do_sleep(self):
-        """Sleep when network error occurs."""
-        if self.sleep:
+            self.update_mode, self.request_timeout, self.raise_exception,
+            session=self.session, segments=self.segments,
+            rate_limiter=RateLimiter(limit_rate) if limit_rate else None,
+            negative_cache=self.negative_cache,
+            controller=self.controller)
+        self.scheduler = DownloadScheduler(controller=self.controller)
+
+    def _do_sleep(self, err: Optional[Exception] = None):
+        """Sleep when network error occurs. Honors `Retry-After` of
+        `429` responses, concurrency of host is already lowered by
+        `self.controller` for them."""
+        if not self.sleep:
+            return
+
+        res = getattr(err, 'response', None)
+        retry_after = res.headers.get('Retry-After') if res is not None else None
+        if retry_after and retry_after.isdigit():
+            time.sleep(min(int(retry_after), RETRY_AFTER_MAX))
+        else:
             time.sleep(min(expovariate(0.6), 15.0))
 
-    def download(self, target: str):
-        """Public download method for RedditDL."""
-        self._downloader(target)
+    def concurrency_limits(self) -> dict:
+        """Returns current adaptive concurrency limits and stats of hosts."""
+        return self.controller.limits()
+
+    def download(self, target: str) -> int:
+        """Public download method for RedditDL. Returns number of new posts."""
+        return self._downloader(target)
+
+    def download_many(
+            self, targets: Iterable[str],
+            progress: Optional[Callable[[DownloadResult], None]] = None
+            ) -> Iterator[DownloadResult]:
+        """Download targets, yields `DownloadResult` of each media as it finishes.
+        `progress` is called with each result too, from download threads.
+        When iteration is stopped, targets after current one are skipped.
+        Failed media are yielded as `failed` results, raised only if
+        `raise_exception`."""
+
+        targets = list(targets)
+        own_targets = set(targets)
+        results = queue.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def run():
+            try:
+                for target in targets:
+                    if stop.is_set():
+                        break
+                    try:
+                        self._downloader(target, raise_job_errors=self.raise_exception)
+                    except ExistFileOnUpdateModeException:
+                        pass
+                    except (ConnectionException, requests.exceptions.RequestException) as err:
+                        if self.raise_exception:
+                            raise
+                        results.put(DownloadResult(
+                            target, None, target, None, 'failed', error=str(err)))
+            except BaseException as err:  # pylint: disable=broad-except
+                results.put(err)
+            finally:
+                results.put(done)
+
+        def listener(result: DownloadResult):
+            # Results of concurrent calls on same instance
+            if result.target not in own_targets:
+                return
+            if progress:
+                progress(result)
+            results.put(result)
+
+        self._listeners.append(listener)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                result = results.get()
+                if result is done:
+                    break
+                if isinstance(result, BaseException):
+                    raise result
+                yield result
+        finally:
+            stop.set()
+            self._listeners.remove(listener)
+
+    def _emit(self, result: DownloadResult):
+        """Pass result to post store and progress callbacks."""
+        if self.post_store:
+            self.post_store.add_result(result)
+        if self.progress:
+            self.progress(result)
+        for listener in list(self._listeners):
+            listener(result)
+
+    def _print(self, o_str: Optional[str] = None, post_data: Optional[dict] = None):
+        if not self.quiet:
+            print_download_message(o_str=o_str, post_data=post_data)
 
     def _create_folder(self, url: str) -> str:
         """If not exist create folder, for given url.
@@ -175,10 +332,12 @@ class RedditDownloader:
         return os.path.join(os.getcwd(), folder_name)
 
     @_retry_on_connection_error
-    def _request_page(self, url, _attempt: int = 1) -> Response:
+    def _request_page(
+            self, url, headers: Optional[dict] = None, _attempt: int = 1) -> Response:
         """Error wrapper for simple page request."""
 
-        res = requests.get(url, headers=REDDIT_HEADERS, timeout=self.request_timeout)
+        headers = {**REDDIT_HEADERS, **headers} if headers else REDDIT_HEADERS
+        res = self.session.get(url, headers=headers, timeout=self.request_timeout)
         if res.status_code == 403 and 'suspended' in res.text:
             print('Is suspended.')
             return res
@@ -187,40 +346,253 @@ class RedditDownloader:
             res.raise_for_status()
         return res
 
-    def _downloader(self, url: str, ):
-        """Find new pages and call `self._download_page`."""
+    def _get_page(self, url: str) -> Tuple[list, Optional[str]]:
+        """Returns posts data and next page url of page. If http
+        cache is enabled, does conditional request and skips
+        parsing when page is not modified."""
 
-        if not re.search(r'/(r|reddit|u|user)+/[a-zA-Z_0-9-]+/comments', urlparse(url).path):
-            path = self._create_folder(url)
-        else:
-            path = os.getcwd()
+        entry = self.http_cache.get(url) if self.http_cache else None
+        res = self._request_page(url, headers=HttpCache.conditional_headers(entry))
+
+        if entry and res.status_code == 304:
+            return entry['posts'], entry['next_url']
+
+        body_hash = HttpCache.body_hash(res.content)
+        if entry and entry['body_hash'] == body_hash:
+            return entry['posts'], entry['next_url']
 
-        has_next_page = True
+        posts_data, next_url = self._parse_page(res.text)
+
+        if self.http_cache and res.ok:
+            self.http_cache.set(url, {
+                'etag': res.headers.get('ETag'),
+                'last_modified': res.headers.get('Last-Modified'),
+                'body_hash': body_hash,
+                'posts': posts_data,
+                'next_url': next_url,
+            })
+
+        return posts_data, next_url
+
+    def _target_path(self, url: str) -> str:
+        """Returns download folder of target url."""
+
+        if not is_comments_url(urlparse(url).path):
+            return self._create_folder(url)
+        return os.getcwd()
+
+    def _save_caches(self):
+        """Write caches to disk."""
+        if self.negative_cache is not None:
+            self.negative_cache.save()
+
+    def _manifest(self, d_path: str) -> Manifest:
+        """Returns manifest of download folder."""
+        with self._manifests_lock:
+            if d_path not in self._manifests:
+                self._manifests[d_path] = Manifest(d_path)
+            return self._manifests[d_path]
+
+    def _join_downloads(self, folders: Iterable[str], raise_errors: bool = True):
+        """Wait for scheduled downloads and merges, save manifests of
+        folders, caches and post store. If `raise_errors`, first
+        download error is raised after saving."""
+
+        try:
+            self.scheduler.join(raise_errors)
+        finally:
+            self.downloader.merge_pool.join()
+            for folder in folders:
+                self._manifest(folder).save()
+            self._save_caches()
+            if self.post_store:
+                self.post_store.flush()
+
+    def verify(self, target: str) -> int:
+        """Check files of target folder against its manifest, re-download
+        missing, truncated or corrupted ones without crawling.
+        Returns number of re-downloaded files."""
+
+        path = self._target_path(target)
+        broken = self._manifest(path).verify()
+
+        try:
+            for post_id, url, entry in broken:
+                self._print(o_str=f'Repairing {entry["filename"]}')
+                self.scheduler.submit(
+                    url, self._download_job,
+                    target, {'id': post_id or None}, url, path, {}, entry['filename'])
+        finally:
+            self._join_downloads([path])
+
+        return len(broken)
+
+    def download_missing(
+            self,
+            author: Optional[str] = None,
+            subreddit: Optional[str] = None,
+            since: Optional[float] = None) -> int:
+        """Re-download failed or unfinished media from post store, without
+        crawling. Filters by author, subreddit and since unix time.
+        Returns number of scheduled media."""
+
+        if not self.post_store:
+            raise ValueError('Post store is not enabled.')
+
+        rows = self.post_store.missing_media(author, subreddit, since)
+        folders = set()
+        try:
+            for row in rows:
+                self._print(o_str=f'Retrying {row["url"]}')
+                folders.add(row['folder'])
+                self.scheduler.submit(
+                    row['url'], self._download_job,
+                    '', {'id': row['post_id']}, row['url'], row['folder'], {},
+                    os.path.basename(row['path']) if row['path'] else None)
+        finally:
+            self._join_downloads(folders)
+
+        return len(rows)
+
+    def _downloader(self, url: str, raise_job_errors: bool = True) -> int:
+        """Find new pages and call `self._download_page`. Stops
+        on last seen post of previous call for same url.
+        Returns number of new posts. Errors of download jobs,
+        already emitted as failed results, are raised if
+        `raise_job_errors`."""
+
+        path = self._target_path(url)
+
+        last_seen = self._last_seen.get(url)
+        chronological = is_chronological_url(url)
+        newest = None
+        new_posts = 0
         page_url = url
 
-        while has_next_page:
-            res = self._request_page(page_url)
-            soup = BeautifulSoup(res.text, 'html.parser')
+        try:
+            if self.download_comments and is_comments_url(urlparse(url).path):
+                return self._download_comments(url, path)
+
+            try:
+                while page_url:
+                    posts_data, page_url = self._get_page(page_url)
+
+                    if last_seen:
+                        posts_data, reached = _until_last_seen(
+                            posts_data, last_seen, chronological)
+                        page_url = None if reached else page_url
+
+                    for post in posts_data:
+                        timestamp = int(post['timestamp'] or 0)
+                        if not newest or timestamp > newest[1]:
+                            newest = (post['id'], timestamp)
+                    new_posts += len(posts_data)
+
+                    # Download page
+                    self._download_page(posts_data, path, url)
+            except ExistFileOnUpdateModeException as err:
+                # Update mode stops on downloaded content, crawl is complete
+                err.new_posts = new_posts
+                if newest:
+                    self._last_seen[url] = newest
+                raise
+
+            # Remember newest post for next call, only after complete crawl
+            if newest:
+                self._last_seen[url] = newest
+        finally:
+            # Wait for scheduled downloads of target
+            self._join_downloads([path], raise_job_errors)
+
+        return new_posts
+
+    def _download_comments(self, url: str, d_path: str) -> int:
+        """Download post and all media linked in its comments, including
+        `load more comments` and `continue this thread` ones. Thread is
+        processed batch by batch, links are deduplicated before download.
+        Returns number of links."""
+
+        parsed = urlparse(url)
+        query = dict(parse_qsl(parsed.query))
+        query['limit'] = str(COMMENTS_LIMIT)
+        pages = [urlunparse(parsed._replace(query=urlencode(query)))]
+        visited = set()
+        seen = set()
+        nsfw = False
+
+        while pages:
+            page_url = pages.pop(0)
+            if page_url in visited:
+                continue
+            visited.add(page_url)
+            page_html = self._request_page(page_url).text
+
+            # Post itself, only on first page
+            if len(visited) == 1:
+                posts_data, _ = self._parse_page(page_html, only_posts=True)
+                nsfw = any(_['nsfw'] for _ in posts_data)
+                seen.update(_['url'] for _ in posts_data)
+                self._download_page(posts_data, d_path, url)
+
+            more = []
+            comments = parse_comments(page_html)
+            while True:
+                self._download_comment_links(comments['links'], seen, nsfw, d_path, url)
+                pages += [urljoin(page_url, _) for _ in comments['threads']]
+                more += comments['more']
+                if not more:
+                    break
+
+                link_id, sort, children = more.pop(0)
+                more += [(link_id, sort, children[MORECHILDREN_BATCH:])] \
+                    if children[MORECHILDREN_BATCH:] else []
+                comments = parse_comments(self._request_more_children(
+                    link_id, sort, children[:MORECHILDREN_BATCH]), is_page=False)
+
+        return len(seen)
+
+    def _download_comment_links(
+            self, links: list, seen: set, nsfw: bool, d_path: str, target: str):
+        """Download not seen links of comments as a batch."""
+
+        posts_data = []
+        indexes = {}
+        for comment_id, link in links:
+            if link in seen:
+                continue
+            seen.add(link)
+            indexes[comment_id] = indexes.get(comment_id, -1) + 1
+            posts_data.append(link_post_data(comment_id, indexes[comment_id], link, nsfw))
+
+        if posts_data:
+            self._download_page(posts_data, d_path, target)
 
-            # Download page
-            self._download_page(soup, path)
+    @_retry_on_connection_error
+    def _request_more_children(
+            self, link_id: str, sort: str, children: list, _attempt: int = 1) -> str:
+        """Returns html of `load more comments` children."""
 
-            has_next_page = soup.find('span', class_='next-button')
-            if  not has_next_page:
-                break
+        res = self.session.post(
+            'https://old.reddit.com/api/morechildren', headers=REDDIT_HEADERS,
+            data={'link_id': link_id, 'sort': sort, 'children': ','.join(children),
+                  'api_type': 'json'},
+            timeout=self.request_timeout)
+        res.raise_for_status()
 
-            # Build `page_url`
-            dummy_url = has_next_page.find('a').get('href')
-            parsed =  urlparse(dummy_url)
-            query_params = {'sort': 'new'}
-            query_params.update(dict(parse_qsl(parsed.query)))
+        try:
+            return parse_more_children(res.json())
+        except ValueError:
+            return ''
 
-            page_url = urlunparse(
-                urlparse(dummy_url)._replace(query=urlencode(query_params)))
+    def _parse_page(self, html: str, only_posts: bool = False) -> Tuple[list, Optional[str]]:
+        """Returns posts data and next page url from given page.
+        If `only_posts`, rest of page (exp. comments) is not parsed."""
 
-    def _download_page(self, soup: BeautifulSoup, d_path: str):
-        """Extract data and download from given page."""
+        # pylint: disable=import-outside-toplevel
+        from bs4 import BeautifulSoup, SoupStrainer
 
+        strainer = SoupStrainer('div', id='siteTable') if only_posts else None
+        soup = BeautifulSoup(html, 'html.parser', parse_only=strainer)
         main_div = soup.find('div', id='siteTable')
         posts = main_div.find_all('div', class_='thing', recursive=False) if main_div else []
 
@@ -229,15 +601,37 @@ class RedditDownloader:
             post = main_div.find('div', class_='thing')
             posts = [post] if post else []
 
-        for post in posts:
-            # Extract post data
-            post_data = self._get_post_data(post)
+        posts_data = [self._get_post_data(post) for post in posts]
 
-            if not post_data or not post_data['url']:
-                continue
+        next_button = soup.find('span', class_='next-button')
+        if not next_button:
+            return posts_data, None
+
+        # Build `page_url`
+        dummy_url = next_button.find('a').get('href')
+        parsed =  urlparse(dummy_url)
+        query_params = {'sort': 'new'}
+        query_params.update(dict(parse_qsl(parsed.query)))
+
+        next_url = urlunparse(parsed._replace(query=urlencode(query_params)))
+        return posts_data, next_url
+
+    def _download_page(self, posts_data: list, d_path: str, target: str = ''):
+        """Download given posts of page."""
 
+        posts_data = [
+            _ for _ in posts_data
+            if _ and _['url'] and not (_['nsfw'] and not self.download_nsfw)]
+
+        if self.post_store:
+            self.post_store.add_posts(posts_data, d_path)
+
+        # Existence checks are lookups in one listing of folder
+        existing = set(os.listdir(d_path)) if os.path.isdir(d_path) else set()
+        scheduled = set()
+        for post_data, future in zip(posts_data, self._resolve_posts(posts_data, d_path)):
             # Extract down data
-            down_data = self._get_download_info(post_data, d_path)
+            down_data = future.result()
             if not down_data:
                 continue
 
@@ -247,19 +641,44 @@ class RedditDownloader:
             if not down_urls:
                 continue
 
+            filenames = down_data.get('filenames', {})
             for url in down_urls:
-                filename = url_to_filename(url)
-                file_full_path = os.path.join(d_path, filename)
+                if self._is_dead(url):
+                    continue
 
-                if not os.path.exists(file_full_path):
-                    print_download_message(post_data=post_data)
-                    self._download_post(url, d_path, down_data['headers'])
+                filename = filenames.get(url) or url_to_filename(url)
+                # Galleries downloaded before `<postid>_<index>` names
+                if filename not in existing and url_to_filename(url) in existing:
+                    filename = url_to_filename(url)
+                file_full_path = os.path.join(d_path, filename)
 
-                elif self.update_mode:
+                if file_full_path in scheduled:
+                    continue
+
+                if filename not in existing:
+                    self._print(post_data=post_data)
+                    scheduled.add(file_full_path)
+                    if self.post_store:
+                        self.post_store.add_media(post_data['id'], url, file_full_path, 'pending')
+                    self.scheduler.submit(
+                        url, self._download_job,
+                        target, post_data, url, d_path, down_data['headers'],
+                        filenames.get(url))
+                    continue
+
+                self._emit(DownloadResult(
+                    target, post_data['id'], url, file_full_path, 'exists',
+                    size=os.path.getsize(file_full_path)))
+
+                # Files downloaded before manifests
+                manifest = self._manifest(d_path)
+                if not manifest.has(post_data['id'], url):
+                    manifest.add(post_data['id'], url, file_full_path)
+
+                if self.update_mode:
                     raise ExistFileOnUpdateModeException(f'File exist {file_full_path}')
 
-                else:
-                    print_download_message(o_str=f'File exist {file_full_path}')
+                self._print(o_str=f'File exist {file_full_path}')
 
     def _filter_urls(self, urls, nsfw):
         """Filter given urls by user choices."""
@@ -280,13 +699,73 @@ class RedditDownloader:
 
         return filtered
 
+    def _download_job(
+            self, target: str, post_data: dict, url: str, d_path: str, headers: dict,
+            filename: Optional[str] = None):
+        """Download media of post, emit its `DownloadResult`."""
+
+        started = time.monotonic()
+        # Hls media is finished in merge worker, when merging is done
+        on_merged = partial(self._merged, target, post_data, url, d_path, started)
+        try:
+            file_path = self._download_post(url, d_path, headers, filename, on_merged)
+        except LargeFileException:
+            # Scheduler runs it again in slow lane
+            raise
+        except Exception as err:
+            self._emit(DownloadResult(
+                target, post_data['id'], url, None, 'failed',
+                elapsed=time.monotonic() - started, error=str(err)))
+            raise
+
+        if isinstance(file_path, Future):
+            return
+
+        self._finish_job(target, post_data, url, d_path, started, file_path)
+
+    def _merged(
+            self, target: str, post_data: dict, url: str, d_path: str,
+            started: float, file_path: Optional[str]):
+        """Finish job of merged hls media."""
+
+        if not file_path:
+            self._emit(DownloadResult(
+                target, post_data['id'], url, None, 'failed',
+                elapsed=time.monotonic() - started, error='Merging failed.'))
+            return
+
+        try:
+            self._finish_job(target, post_data, url, d_path, started, file_path)
+        except OSError as err:
+            # Exp. merged file is removed before hashing into manifest
+            self._emit(DownloadResult(
+                target, post_data['id'], url, None, 'failed',
+                elapsed=time.monotonic() - started, error=str(err)))
+
+    def _finish_job(
+            self, target: str, post_data: dict, url: str, d_path: str,
+            started: float, file_path: Optional[str]):
+        """Add downloaded file to manifest, emit its `DownloadResult`."""
+
+        if file_path:
+            self._manifest(d_path).add(post_data['id'], url, file_path)
+
+        self._emit(DownloadResult(
+            target, post_data['id'], url, file_path,
+            'downloaded' if file_path else 'skipped',
+            size=os.path.getsize(file_path) if file_path else 0,
+            elapsed=time.monotonic() - started))
+
     @_retry_on_connection_error
     def _download_post(
-            self, url: str, d_path: str, headers: dict, _attempt : int = 1):
+            self, url: str, d_path: str, headers: dict, filename: Optional[str] = None,
+            on_merged: Optional[Callable[[Optional[str]], None]] = None,
+            _attempt : int = 1) -> Union[str, Future, None]:
         """Error wrapper for Downloader().download()"""
-        self.downloader.download(url, d_path, headers=headers)
+        return self.downloader.download(
+            url, d_path, headers=headers, filename=filename, on_merged=on_merged)
 
-    def _get_post_data(self, post: BeautifulSoup) -> dict:
+    def _get_post_data(self, post: 'BeautifulSoup') -> dict:
         """Returns post data."""
 
         # Set post title
@@ -304,6 +783,7 @@ class RedditDownloader:
             cached_html = str(expando)
 
         post_data = {
+            'id': post.get('data-fullname'),
             'url': post.get('data-url'),
             'kind': post.get('data-kind'),
             'is_reddit_video': post.get('data-kind') == 'video',
@@ -317,6 +797,7 @@ class RedditDownloader:
             'timestamp': post.get('data-timestamp'),
             'type': post.get('data-type'),
             'is_gallery': post.get('data-is-gallery') == 'true',
+            'stickied': 'stickied' in (post.get('class') or []),
             'cached_html': cached_html,
             'title': post_title
         }
@@ -324,78 +805,82 @@ class RedditDownloader:
         return post_data
 
     def _get_download_info(self, post_data: dict, d_path: str) -> dict:
-        """Select downloadable links from `post_data`"""
-
-        data = {'headers': {}, 'down_urls': []}
-        data_url = post_data['url']
-        cached_html = post_data.get('cached_html')
-        new_soup = BeautifulSoup(cached_html, 'html.parser') if cached_html else None
-
-        mega_regex_pattern = re.compile(r'.(jpeg|jpg|png|tiff|gif|mp4|gifv)(\?+|$)')
-
-        # Is data url direct link for picture?
-        if re.search(mega_regex_pattern, data_url):
-            down_url = data_url
-
-            # '.gifv' is just a .mp4 by igmur, this replacement is required for igmur
-            if '.gifv' in down_url:
-                # Check if content exist.
-                with requests.get(down_url, headers=HEADERS, timeout=self.request_timeout) as res:
-                    is_removed = 'https://i.imgur.com/removed.png' == res.url
-                    down_url = down_url.replace('.gifv', '.mp4') if not is_removed else None
-
-            data['down_urls'].append(down_url)
-
-        elif 'redgifs.com' in data_url:
-            r_url = data_url
-            # If `r_url` endswith .jpg, .png remove it.
-            re_list = re.findall(r'([A-Za-z./:]+)\.[a-zA-Z]+$', r_url)
-            if re_list:
-                r_url = re_list[0]
-
-            # Special for redgifs, cause we doing request for getting down url
-            # Check file is exist
-            exist = False
-            vd_name = r_url.split('/')[-1]
-            for _ in os.listdir(d_path):
-                if vd_name.lower() in _.lower():
-                    exist = True
-
-            if exist and self.update_mode:
-                raise ExistFileOnUpdateModeException(f'{vd_name} is exist on update.')
-
-            # Get video down url, prepare header for download
-            if not exist:
-                token = self._get_redgifs_token()
-                down_url = self._get_redgifs_video(r_url, token)
-                data['down_urls'].append(down_url)
-                data['headers'] = {'Authorization': f'Bearer {token}'}
-
-        elif new_soup:
-            if post_data['is_gallery']:
-                for a_tag in new_soup.find_all('a', class_=re.compile('gallery-item')):
-                    # Could be image or gif
-                    data['down_urls'].append(a_tag.get('href'))
-
-            elif post_data['is_reddit_video']:
-                video = new_soup.find('div', id=re.compile('video'))
-                down_url = video.get('data-hls-url') if video else None
-
-                data['down_urls'].append(down_url)
+        """Select downloadable links from `post_data` with host resolvers.
+        Results are memoized by post id and folder, resolvers may check
+        existing files of folder."""
+
+        post_id = post_data.get('id')
+        key = (post_id, d_path)
+        with self._resolved_lock:
+            if post_id and key in self._resolved:
+                self._resolved.move_to_end(key)
+                return self._resolved[key]
+
+        # Known dead media
+        if self._is_dead(post_data['url']):
+            return {}
+
+        resolver = get_resolver(post_data)
+        data = resolver(self, post_data, d_path) if resolver else {'down_urls': []}
 
         # Filter for `None` and empty `str`
         data['down_urls'] = list(filter(None, data['down_urls']))
-
-        if not data['down_urls']:
-            return {}
+        data = data if data['down_urls'] else {}
+
+        if post_id:
+            with self._resolved_lock:
+                self._resolved[key] = data
+                # Keep recent ones, watch mode runs forever
+                while len(self._resolved) > RESOLVED_CACHE_SIZE:
+                    self._resolved.popitem(last=False)
         return data
 
+    def _is_dead(self, url: str) -> bool:
+        """Check url is in negative cache."""
+        return self.negative_cache is not None and url in self.negative_cache
+
+    def _mark_dead(self, url: str):
+        """Add url to negative cache, if it's enabled."""
+        if self.negative_cache is not None:
+            self.negative_cache.add(url)
+
+    def _resolve_posts(self, posts_data: list, d_path: str) -> list:
+        """Returns download info futures of `posts_data` in the same order.
+        Resolvers which need network run concurrently, others inline."""
+
+        futures = []
+        for post_data in posts_data:
+            resolver = get_resolver(post_data)
+            post_id = post_data.get('id')
+
+            if (resolver and getattr(resolver, 'needs_network', False)
+                    and (post_id, d_path) not in self._resolved
+                    and not self._is_dead(post_data['url'])):
+                if not self._resolver_pool:
+                    self._resolver_pool = ThreadPoolExecutor(max_workers=RESOLVER_WORKERS)
+                futures.append(self._resolver_pool.submit(
+                    self._get_download_info, post_data, d_path))
+            else:
+                future = Future()
+                try:
+                    future.set_result(self._get_download_info(post_data, d_path))
+                except Exception as err:  # pylint: disable=broad-except
+                    future.set_exception(err)
+                futures.append(future)
+
+        return futures
+
     @_retry_on_connection_error
     def _get_redgifs_token(self, _attempt: int = 1):
         """Error wrapper for `get_redgifs_token()`"""
-        return get_redgifs_token()
+        return get_redgifs_token(self.request_timeout, self.session)
 
     @_retry_on_connection_error
     def _get_redgifs_video(self, url: str, token: Optional[str] = None, _attempt: int = 1):
         """Error wrapper for `_get_redgifs_video()`"""
-        return get_redgifs_video(url, token)
+        return get_redgifs_video(url, token, self.request_timeout, self.session)
+
+    @_retry_on_connection_error
+    def _get_streamable_video(self, url: str, _attempt: int = 1):
+        """Error wrapper for `get_streamable_video()`"""
+        return get_streamable_video(url, self.request_timeout, self.session)
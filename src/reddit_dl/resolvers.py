@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.resolvers: host resolvers for extracting downloadable media urls.
+
+Every resolver has the signature ``resolver(redl, post_data, d_path) -> dict``
+and returns ``{'headers': {...}, 'down_urls': [...]}``, optionally with
+``'filenames': {url: filename}`` to override names. Resolvers registered
+with ``needs_network=True`` do requests and are run concurrently by
+:class:`RedditDownloader`, others are run inline."""
+
+import os
+import re
+from typing import TYPE_CHECKING, Callable, Optional
+from urllib.parse import urlparse, urlunparse
+
+from .exceptions import ExistFileOnUpdateModeException
+from .imgur import get_imgur_video
+from .utils import url_to_filename
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+
+RESOLVERS = {}
+
+RGX_DIRECT = re.compile(r'.(jpeg|jpg|png|tiff|gif|mp4|gifv)(\?+|$)')
+RGX_GALLERY_ITEM = re.compile('gallery-item')
+RGX_VIDEO = re.compile('video')
+RGX_EXTENSION = re.compile(r'([A-Za-z./:]+)\.[a-zA-Z]+$')
+
+def register_resolver(*hosts: str, needs_network: bool = False) -> Callable:
+    """Decorator to register resolver for given hosts."""
+    def decorator(func: Callable) -> Callable:
+        func.needs_network = needs_network
+        for host in hosts:
+            RESOLVERS[host] = func
+        return func
+    return decorator
+
+def get_resolver(post_data: dict) -> Optional[Callable]:
+    """Returns resolver for `post_data`, by host of post url
+    than by post type. If not any resolver returns None."""
+
+    host = urlparse(post_data['url']).netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    # Try parent domains too. Exp. `v3.redgifs.com` -> `redgifs.com`
+    parts = host.split('.')
+    for i in range(len(parts) - 1):
+        resolver = RESOLVERS.get('.'.join(parts[i:]))
+        if resolver:
+            return resolver
+
+    if post_data['is_gallery']:
+        return resolve_gallery
+    if post_data['is_reddit_video']:
+        return resolve_reddit_video
+    if re.search(RGX_DIRECT, post_data['url']):
+        return resolve_direct
+    return None
+
+def _cached_soup(post_data: dict) -> Optional['BeautifulSoup']:
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
+    cached_html = post_data.get('cached_html')
+    return BeautifulSoup(cached_html, 'html.parser') if cached_html else None
+
+@register_resolver('i.redd.it')
+def resolve_direct(redl, post_data: dict, d_path: str) -> dict:
+    """Data url is direct link for media."""
+    data = {'headers': {}, 'down_urls': []}
+    if re.search(RGX_DIRECT, post_data['url']):
+        data['down_urls'].append(post_data['url'])
+    return data
+
+@register_resolver('imgur.com')
+def resolve_imgur(redl, post_data: dict, d_path: str) -> dict:
+    """'.gifv' is just a .mp4 by igmur, this replacement is required for igmur"""
+    data = resolve_direct(redl, post_data, d_path)
+    data['down_urls'] = [get_imgur_video(_) for _ in data['down_urls']]
+    return data
+
+@register_resolver('v.redd.it')
+def resolve_reddit_video(redl, post_data: dict, d_path: str) -> dict:
+    """Hls url of reddit hosted videos from cached html."""
+    data = {'headers': {}, 'down_urls': []}
+    new_soup = _cached_soup(post_data)
+    if new_soup:
+        video = new_soup.find('div', id=RGX_VIDEO)
+        data['down_urls'].append(video.get('data-hls-url') if video else None)
+    return data
+
+def original_gallery_url(url: Optional[str]) -> Optional[str]:
+    """Returns original resolution url of gallery item.
+    Exp. `https://preview.redd.it/abc.jpg?width=640&s=...` -> `https://i.redd.it/abc.jpg`"""
+
+    if not url:
+        return url
+    parsed = urlparse(url)
+    if parsed.netloc.lower() != 'preview.redd.it':
+        return url
+    return urlunparse(parsed._replace(netloc='i.redd.it', query='', params='', fragment=''))
+
+def resolve_gallery(redl, post_data: dict, d_path: str) -> dict:
+    """Original urls of gallery items from cached html. Could be image
+    or gif. Items are named `<postid>_<index>` to keep their order."""
+    data = {'headers': {}, 'down_urls': [], 'filenames': {}}
+    new_soup = _cached_soup(post_data)
+    if not new_soup:
+        return data
+
+    post_id = (post_data.get('id') or '').split('_')[-1]
+    for a_tag in new_soup.find_all('a', class_=RGX_GALLERY_ITEM):
+        url = original_gallery_url(a_tag.get('href'))
+        if not url or url in data['down_urls']:
+            continue
+        data['down_urls'].append(url)
+
+        filename = url_to_filename(url)
+        if post_id and filename:
+            index = len(data['down_urls'])
+            data['filenames'][url] = f'{post_id}_{index}{os.path.splitext(filename)[1]}'
+    return data
+
+@register_resolver('redgifs.com', 'gfycat.com', needs_network=True)
+def resolve_redgifs(redl, post_data: dict, d_path: str) -> dict:
+    """Video url from redgifs api. Gfycat content moved to
+    redgifs with same names, so gfycat urls resolved here too."""
+
+    if re.search(RGX_DIRECT, post_data['url']):
+        return resolve_direct(redl, post_data, d_path)
+
+    data = {'headers': {}, 'down_urls': []}
+    r_url = post_data['url']
+    # If `r_url` endswith .jpg, .png remove it.
+    re_list = re.findall(RGX_EXTENSION, r_url)
+    if re_list:
+        r_url = re_list[0]
+
+    # Special for redgifs, cause we doing request for getting down url
+    # Check file is exist
+    exist = False
+    vd_name = r_url.split('/')[-1].lower()
+    for _ in os.listdir(d_path):
+        if vd_name in _.lower():
+            exist = True
+
+    if exist and redl.update_mode:
+        raise ExistFileOnUpdateModeException(f'{vd_name} is exist on update.')
+
+    # Get video down url, prepare header for download
+    if not exist:
+        token = redl._get_redgifs_token()
+        down_url = redl._get_redgifs_video(r_url, token)
+        if not down_url:
+            redl._mark_dead(post_data['url'])
+        data['down_urls'].append(down_url)
+        data['headers'] = {'Authorization': f'Bearer {token}'}
+
+    return data
+
+@register_resolver('streamable.com', needs_network=True)
+def resolve_streamable(redl, post_data: dict, d_path: str) -> dict:
+    """Video url from streamable api."""
+    data = {'headers': {}, 'down_urls': []}
+    down_url = redl._get_streamable_video(post_data['url'])
+    if not down_url:
+        redl._mark_dead(post_data['url'])
+    data['down_urls'].append(down_url)
+    return data
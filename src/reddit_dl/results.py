@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.results: structured results of downloads."""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class DownloadResult:
+    """Result of a single media download.
+
+    `status` is one of `downloaded`, `exists`, `skipped` (nothing found
+    at url, exp. removed media) or `failed`."""
+
+    target: str
+    post_id: Optional[str]
+    url: str
+    path: Optional[str]
+    status: str
+    size: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
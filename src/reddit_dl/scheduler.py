@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.scheduler: size aware download scheduling."""
+
+import re
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Optional
+from urllib.parse import urlparse
+
+from .constants import FAST_LANE_WORKERS, SLOW_LANE_WORKERS
+from .exceptions import LargeFileException
+
+if TYPE_CHECKING:
+    from .concurrency import ConcurrencyController
+
+
+RGX_HLS = re.compile(r'.m3u8(\?+|$)')
+
+_lane = threading.local()
+
+def _mark_fast_lane():
+    _lane.fast = True
+
+def in_fast_lane() -> bool:
+    """Check current thread is a fast lane worker of `DownloadScheduler`."""
+    return getattr(_lane, 'fast', False)
+
+class RateLimiter:
+    """Token bucket limiting total bytes per second of all threads."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._allowance = rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int):
+        """Take `amount` bytes from bucket, sleep if bucket is empty."""
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+            self._last = now
+            self._allowance -= amount
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0.0
+
+        if wait:
+            time.sleep(wait)
+
+class DownloadScheduler:
+    """Runs downloads in two lanes, so big files don't block small ones.
+
+    Hls videos go to slow lane, others to fast lane. A job which raises
+    `LargeFileException` in fast lane, exp. when `Content-Length` of its
+    download request is big, is moved to slow lane and run again there.
+
+    With a `controller`, fast lane jobs wait in a queue per host and
+    take a worker only while their host is under its concurrency limit,
+    so workers don't block on a busy host while others are idle."""
+
+    def __init__(
+            self,
+            fast_workers: int = FAST_LANE_WORKERS,
+            slow_workers: int = SLOW_LANE_WORKERS,
+            controller: Optional['ConcurrencyController'] = None):
+        self.controller = controller
+
+        self._fast_lane = ThreadPoolExecutor(
+            max_workers=fast_workers, initializer=_mark_fast_lane)
+        self._slow_lane = ThreadPoolExecutor(max_workers=slow_workers)
+        self._futures = []
+        self._pending = {}
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def submit(self, url: str, func: Callable, *args, **kwargs):
+        """Schedule `func(*args, **kwargs)` which downloads `url`."""
+
+        if re.search(RGX_HLS, url):
+            self._add(self._slow_lane.submit(func, *args, **kwargs))
+        else:
+            self._queue(url, func, *args, **kwargs)
+
+    def join(self, raise_errors: bool = True):
+        """Wait for all scheduled downloads. Raises first error
+        if any and `raise_errors`."""
+
+        error = None
+        while True:
+            with self._lock:
+                futures, self._futures = self._futures, []
+            if not futures:
+                break
+
+            for future in futures:
+                if future.exception() and not error:
+                    error = future.exception()
+
+        if error and raise_errors:
+            raise error
+
+    def _add(self, future):
+        with self._lock:
+            self._futures.append(future)
+
+    def _queue(self, url: str, func: Callable, *args, **kwargs):
+        """Queue fast lane job by host of url."""
+
+        if not self.controller:
+            self._add(self._fast_lane.submit(self._run, func, *args, **kwargs))
+            return
+
+        host = urlparse(url).netloc
+        with self._lock:
+            self._pending.setdefault(host, deque()).append((func, args, kwargs))
+        self._dispatch()
+
+    def _dispatch(self):
+        """Move queued jobs to fast lane while their host has free slots.
+        Running jobs dispatch again when they finish, so `join()` sees
+        all queued jobs."""
+
+        with self._lock:
+            for host, jobs in self._pending.items():
+                limit = self.controller.limit(host)
+                while jobs and self._running.get(host, 0) < limit:
+                    func, args, kwargs = jobs.popleft()
+                    self._running[host] = self._running.get(host, 0) + 1
+                    self._futures.append(self._fast_lane.submit(
+                        self._run_on_host, host, func, *args, **kwargs))
+
+    def _run_on_host(self, host: str, func: Callable, *args, **kwargs):
+        try:
+            return self._run(func, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._running[host] -= 1
+            self._dispatch()
+
+    def _run(self, func: Callable, *args, **kwargs):
+        """Run fast lane job, move it to slow lane if it's large."""
+        try:
+            return func(*args, **kwargs)
+        except LargeFileException:
+            self._add(self._slow_lane.submit(func, *args, **kwargs))
+            return None
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.store: compact SQLite store of posts and their media."""
+
+import sqlite3
+import threading
+from typing import List, Optional
+
+from .results import DownloadResult
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    subreddit TEXT,
+    author TEXT,
+    timestamp INTEGER,
+    title TEXT,
+    url TEXT,
+    permalink TEXT,
+    nsfw INTEGER,
+    score INTEGER,
+    comments_count INTEGER,
+    folder TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_subreddit ON posts (subreddit, timestamp);
+CREATE INDEX IF NOT EXISTS posts_author ON posts (author, timestamp);
+CREATE INDEX IF NOT EXISTS posts_timestamp ON posts (timestamp);
+
+CREATE TABLE IF NOT EXISTS media (
+    post_id TEXT,
+    url TEXT,
+    path TEXT,
+    status TEXT,
+    size INTEGER,
+    PRIMARY KEY (post_id, url)
+);
+CREATE INDEX IF NOT EXISTS media_status ON media (status);
+'''
+
+def _int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class PostStore:
+    """SQLite store of crawled posts and status of their media.
+
+    Posts are written per listing page, media results are buffered
+    and written with `flush()`, so writes are done in batches. Media
+    is `pending` from scheduling until its download result."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._media = []
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def add_posts(self, posts_data: List[dict], folder: str):
+        """Insert or update posts of a page."""
+
+        rows = [(
+            _['id'], _.get('subreddit'), _.get('author'), _int(_.get('timestamp')),
+            _.get('title'), _['url'], _.get('permalink'), int(bool(_.get('nsfw'))),
+            _int(_.get('score')), _int(_.get('comments_count')), folder)
+            for _ in posts_data if _.get('id')]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def add_media(
+            self, post_id: Optional[str], url: str, path: Optional[str],
+            status: str, size: int = 0):
+        """Buffer media status, written on `flush()`."""
+        if post_id:
+            with self._lock:
+                self._media.append((post_id, url, path, status, size))
+
+    def add_result(self, result: DownloadResult):
+        """Buffer media result, written on `flush()`."""
+        self.add_media(result.post_id, result.url, result.path, result.status, result.size)
+
+    def flush(self):
+        """Write buffered media results."""
+        with self._lock, self._conn:
+            media, self._media = self._media, []
+            # Rows are applied in order, so last status wins. Failed results
+            # have no path, keep the one recorded on scheduling. Update then
+            # insert works on SQLite older than 3.24, without upsert.
+            for post_id, url, path, status, size in media:
+                cursor = self._conn.execute(
+                    '''UPDATE media SET path = COALESCE(?, path), status = ?, size = ?
+                       WHERE post_id = ? AND url = ?''',
+                    (path, status, size, post_id, url))
+                if not cursor.rowcount:
+                    self._conn.execute(
+                        'INSERT INTO media VALUES (?, ?, ?, ?, ?)',
+                        (post_id, url, path, status, size))
+
+    def missing_media(
+            self,
+            author: Optional[str] = None,
+            subreddit: Optional[str] = None,
+            since: Optional[float] = None) -> List[sqlite3.Row]:
+        """Returns media which is failed or never finished (`pending`),
+        optionally of posts by author, subreddit and since unix time
+        `since`. Rows have `post_id`, `url`, `path` and `folder`."""
+
+        query = '''
+            SELECT m.post_id, m.url, m.path, p.folder
+            FROM media m JOIN posts p ON p.id = m.post_id
+            WHERE m.status IN ('failed', 'pending')'''
+        params = []
+        if author:
+            query += ' AND p.author = ?'
+            params.append(author)
+        if subreddit:
+            query += ' AND p.subreddit = ?'
+            params.append(subreddit)
+        if since:
+            # Reddit timestamps are in milliseconds
+            query += ' AND p.timestamp >= ?'
+            params.append(int(since * 1000))
+
+        with self._lock:
+            cursor = self._conn.execute(query + ' ORDER BY p.timestamp DESC', params)
+            cursor.row_factory = sqlite3.Row
+            return cursor.fetchall()
+
+    def close(self):
+        """Flush and close database."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
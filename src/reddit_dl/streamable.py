@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""streamable.com Related Module"""
+
+from urllib.parse import urlparse, unquote, urljoin
+from pathlib import PurePosixPath
+from random import choice
+from typing import Optional
+
+import requests
+
+from .constants import USERAGENTS, TIMEOUT
+
+
+HEADERS = {
+    'User-Agent': choice(USERAGENTS),
+    'Accept': '*/*',
+}
+
+def get_streamable_video(
+        url: str, timeout: int = TIMEOUT, session: Optional[requests.Session] = None) -> str:
+    """Returns downloadable video url from url.
+    If url can't be found than returns empty string."""
+
+    vid_name = PurePosixPath(unquote(urlparse(url).path)).parts[-1]
+
+    vid_url = f'https://api.streamable.com/videos/{vid_name}'
+    res = (session or requests).get(vid_url, headers=HEADERS, timeout=timeout)
+
+    # Deleted or processing videos
+    if res.status_code in [410, 404]:
+        return ''
+
+    # Raise for other bad codes
+    res.raise_for_status()
+
+    try:
+        vd_url = res.json()['files']['mp4']['url']
+    except (KeyError, TypeError):
+        return ''
+
+    if not vd_url:
+        return ''
+
+    # Api returns scheme relative urls. Exp. `//cdn-cf-east.streamable.com/...`
+    return urljoin('https:', vd_url)
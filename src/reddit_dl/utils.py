@@ -2,8 +2,10 @@
 
 """Helper Utils Module"""
 
+import os
 import re
-from urllib.parse import urlparse
+import json
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
 from .constants import ALLOWED_URLS
 
@@ -41,3 +43,44 @@ def url_to_filename(url: str):
             filename = paths[-2]
 
     return filename
+
+def is_chronological_url(url: str) -> bool:
+    """Check url is a listing sorted newest first.
+    Exp. `/r/pics/new/`, `/user/bob/submitted/`"""
+
+    parsed = urlparse(url)
+    parts = [_ for _ in parsed.path.split('/') if _]
+    sort = dict(parse_qsl(parsed.query)).get('sort', 'new')
+
+    if len(parts) >= 2 and parts[0] == 'r':
+        return parts[2:3] == ['new']
+    if len(parts) >= 2 and parts[0] in ('u', 'user'):
+        return parts[2:3] in ([], ['submitted'], ['overview']) and sort == 'new'
+    return False
+
+def new_listing_url(url: str) -> str:
+    """Returns url of same listing sorted newest first, if there is one.
+    Exp. `/r/pics/top/?t=day` -> `/r/pics/new/`"""
+
+    parsed = urlparse(url)
+    parts = [_ for _ in parsed.path.split('/') if _]
+    if len(parts) < 2 or is_chronological_url(url):
+        return url
+
+    if parts[0] == 'r' and parts[2:3] in (
+            [], ['hot'], ['best'], ['top'], ['rising'], ['controversial']):
+        return urlunparse(parsed._replace(path=f'/r/{parts[1]}/new/', query=''))
+
+    if parts[0] in ('u', 'user') and parts[2:3] in ([], ['submitted'], ['overview']):
+        query = {**dict(parse_qsl(parsed.query)), 'sort': 'new'}
+        query.pop('t', None)
+        return urlunparse(parsed._replace(query=urlencode(query)))
+
+    return url
+
+def write_json(path: str, data) -> None:
+    """Atomically write `data` as json to `path`."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
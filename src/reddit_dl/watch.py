@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""reddit_dl.watch: long running watch mode for polling many targets."""
+
+import time
+import heapq
+from typing import TYPE_CHECKING, List
+from urllib.parse import urlparse
+
+import requests
+
+from .exceptions import ExistFileOnUpdateModeException, ConnectionException
+from .constants import WATCH_MIN_INTERVAL, WATCH_MAX_INTERVAL
+from .utils import new_listing_url
+
+if TYPE_CHECKING:
+    from .reddit_dl import RedditDownloader
+
+
+def watch(
+        redl: 'RedditDownloader',
+        targetlist: List[str],
+        min_interval: float = WATCH_MIN_INTERVAL,
+        max_interval: float = WATCH_MAX_INTERVAL) -> None:
+    """Poll targets forever, downloading only new posts of each poll.
+
+    Targets are kept in a priority queue by next poll time. Poll interval
+    of a target is halved when it has new posts and doubled when not,
+    between `min_interval` and `max_interval` seconds. Listings are
+    polled sorted by new, so a poll stops at last seen post. Failed
+    polls are logged and backed off like polls without new posts."""
+
+    targetlist = [new_listing_url(_) for _ in targetlist]
+    queue = [(time.monotonic(), i, target, min_interval)
+             for i, target in enumerate(targetlist)]
+    heapq.heapify(queue)
+
+    while queue:
+        next_poll, i, target, interval = heapq.heappop(queue)
+        time.sleep(max(0.0, next_poll - time.monotonic()))
+
+        print(f'Polling: {urlparse(target).path}')
+        new_posts = 0
+        try:
+            new_posts = redl.download(target)
+        except ExistFileOnUpdateModeException as err:
+            new_posts = err.new_posts
+        except (ConnectionException, requests.exceptions.RequestException) as err:
+            if redl.raise_exception:
+                raise
+            print(f'Polling failed: {urlparse(target).path}: {err}')
+        except Exception as err:  # pylint: disable=broad-except
+            # Failed media downloads are re-raised after the poll,
+            # one of them must not stop watching other targets
+            if redl.raise_exception:
+                raise
+            print(f'Download failed: {urlparse(target).path}: {err}')
+
+        if new_posts:
+            interval = max(min_interval, interval / 2)
+        else:
+            interval = min(max_interval, interval * 2)
+
+        heapq.heappush(queue, (time.monotonic() + interval, i, target, interval))